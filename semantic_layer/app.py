@@ -6,6 +6,7 @@ using the boring-semantic-layer library.
 
 import streamlit as st
 import pandas as pd
+from batch_query import execute_batch
 from semantic_model import create_user_lifecycle_semantic_model
 
 st.set_page_config(
@@ -144,7 +145,7 @@ if run_query:
                         "end": str(date_to),
                     }
 
-                # Query the semantic model
+                # Build the query to preview its SQL
                 query = semantic_model.query(**query_params)
 
                 # Show query info for debugging
@@ -154,8 +155,11 @@ if run_query:
                     st.write("**Generated SQL:**")
                     st.code(query.sql(), language="sql")
 
-                # Execute query
-                result_df = query.execute()
+                # Execute query, downsampling and capping large results
+                result = execute_batch(semantic_model, [query_params])[0]
+                result_df = result["data"]
+                if result["truncated"]:
+                    st.caption("Large result: showing a downsampled subset of rows")
 
                 # Visualization if time grain is selected
                 if time_grain and len(result_df) > 0:
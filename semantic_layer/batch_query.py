@@ -0,0 +1,319 @@
+"""Batched query execution and result reduction for the semantic layer.
+
+Dashboards and agents often ask for several related metrics at once. Instead
+of running one query per request, requests that share the same grouping
+(dimensions, time grain, time range, filters, ordering and limit) are merged
+into a single semantic model query over ``mart_user_state_monthly`` and the
+result is split back out per request.
+
+Large time-series results can also be trimmed before they are rendered or
+serialized, so neither the browser nor an MCP client has to receive every row.
+"""
+
+import json
+
+# Maximum number of rows returned for a single result
+DEFAULT_MAX_ROWS = 5000
+
+# Maximum number of distinct time periods kept in a time series
+DEFAULT_MAX_POINTS = 500
+
+# Query parameters accepted in a request, as for SemanticModel.query
+QUERY_FIELDS = (
+    "measures",
+    "dimensions",
+    "time_grain",
+    "time_range",
+    "filters",
+    "order_by",
+    "limit",
+)
+
+
+def _check_limit(name, value):
+    """Check that a row or period limit is a positive integer.
+
+    Args:
+        name: Name of the limit, used in the error message
+        value: Limit to check
+
+    Raises:
+        ValueError: If the limit is not an integer of at least 1
+    """
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        raise ValueError(f"{name} must be a positive integer, got {value!r}")
+
+
+def _check_fields(index, request, param, required=False):
+    """Check that a request field is a list of field names.
+
+    Args:
+        index: Position of the request in the batch
+        request: Query request
+        param: Name of the field to check
+        required: Whether the list must be non-empty
+
+    Raises:
+        ValueError: If the field is not a list of strings, or is empty while
+            required
+    """
+    value = request.get(param)
+    if value is None and not required:
+        return
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        raise ValueError(f"Request {index}: '{param}' must be a list of strings")
+    if required and not value:
+        raise ValueError(f"Request {index} must select at least one measure")
+
+
+def _check_request(index, request):
+    """Check that a query request only uses supported, well-formed fields.
+
+    Args:
+        index: Position of the request in the batch
+        request: Query request
+
+    Raises:
+        ValueError: If the request is malformed
+    """
+    if not isinstance(request, dict):
+        raise ValueError(f"Request {index} must be a dict")
+
+    unknown = sorted(set(request) - set(QUERY_FIELDS))
+    if unknown:
+        raise ValueError(f"Request {index}: unknown field(s) {', '.join(unknown)}")
+
+    _check_fields(index, request, "measures", required=True)
+    _check_fields(index, request, "dimensions")
+    if request.get("limit") is not None:
+        _check_limit(f"Request {index}: 'limit'", request["limit"])
+
+
+def _query_key(request):
+    """Build a hashable key identifying the grouping of a query request.
+
+    Requests with the same key only differ in their measures and can be
+    answered by the same query.
+
+    Args:
+        request: Query request (see ``build_batches``)
+
+    Returns:
+        tuple: Key describing the grouping of the request
+    """
+    return (
+        tuple(sorted(request.get("dimensions") or [])),
+        request.get("time_grain"),
+        json.dumps(request.get("time_range"), sort_keys=True, default=str),
+        json.dumps(request.get("filters"), sort_keys=True, default=str),
+        json.dumps(request.get("order_by"), default=str),
+        request.get("limit"),
+    )
+
+
+def build_batches(requests):
+    """Merge query requests that share a grouping into combined queries.
+
+    Args:
+        requests: List of query requests, each a dict with ``measures`` and
+            optional ``dimensions``, ``time_grain``, ``time_range``,
+            ``filters``, ``order_by`` and ``limit``
+
+    Returns:
+        list: Tuples of (query parameters, indexes of the requests answered
+        by that query), in order of first appearance
+
+    Raises:
+        ValueError: If a request is not a dict, has unknown fields, does not
+            select any measures, has measures or dimensions that are not lists
+            of strings, or has an invalid limit
+    """
+    batches = {}
+
+    for index, request in enumerate(requests):
+        _check_request(index, request)
+
+        key = _query_key(request)
+        if key not in batches:
+            query_params = {
+                "dimensions": list(request.get("dimensions") or []),
+                "measures": [],
+            }
+            for param in QUERY_FIELDS[2:]:
+                if request.get(param):
+                    query_params[param] = request[param]
+            batches[key] = (query_params, [])
+
+        query_params, indexes = batches[key]
+        for measure in request["measures"]:
+            if measure not in query_params["measures"]:
+                query_params["measures"].append(measure)
+        indexes.append(index)
+
+    return list(batches.values())
+
+
+def _limit_rows(df, max_rows):
+    """Cap the number of rows in a result.
+
+    Args:
+        df: Result dataframe
+        max_rows: Maximum number of rows to keep
+
+    Returns:
+        pd.DataFrame: Dataframe with at most ``max_rows`` rows
+    """
+    if len(df) <= max_rows:
+        return df
+    return df.head(max_rows)
+
+
+def _downsample_time_series(df, time_col, max_points):
+    """Reduce a time series to at most ``max_points`` evenly spaced periods.
+
+    Whole periods are kept or dropped, so every dimension value keeps the same
+    time axis and no aggregated values are altered. The last period is always
+    kept, and the first one too when ``max_points`` is at least 2.
+
+    Args:
+        df: Result dataframe
+        time_col: Name of the time column
+        max_points: Maximum number of distinct periods to keep
+
+    Returns:
+        pd.DataFrame: Downsampled dataframe
+    """
+    if time_col not in df.columns:
+        return df
+
+    periods = df[time_col].drop_duplicates().sort_values()
+    count = len(periods)
+    if count <= max_points:
+        return df
+
+    if max_points == 1:
+        positions = [count - 1]
+    else:
+        positions = sorted(
+            {round(i * (count - 1) / (max_points - 1)) for i in range(max_points)}
+        )
+    kept_periods = periods.iloc[positions]
+
+    return df[df[time_col].isin(kept_periods)]
+
+
+def _reduce_result(df, time_col, dimensions, ordered, max_rows, max_points):
+    """Downsample and row-limit a result, trusting the given limits.
+
+    See ``reduce_result`` for the arguments.
+    """
+    original_rows = len(df)
+
+    if not ordered:
+        sort_cols = [col for col in dimensions or [] if col in df.columns]
+        if time_col and time_col in df.columns:
+            sort_cols = [time_col] + sort_cols
+        if sort_cols:
+            df = df.sort_values(sort_cols, ignore_index=True)
+
+    if time_col and time_col in df.columns and len(df) > 0:
+        rows_per_period = int(df.groupby(time_col, sort=False).size().max())
+        max_points = min(max_points, max(1, max_rows // rows_per_period))
+        df = _downsample_time_series(df, time_col, max_points)
+
+    df = _limit_rows(df, max_rows)
+
+    return df, len(df) < original_rows
+
+
+def reduce_result(df, time_col=None, dimensions=None, ordered=False,
+                  max_rows=DEFAULT_MAX_ROWS, max_points=DEFAULT_MAX_POINTS):
+    """Downsample and row-limit a result before rendering or serialization.
+
+    Unless the query had an explicit order, the result is sorted by time and
+    dimensions first, since query results come back in no fixed order. For
+    time series the row limit is applied by keeping fewer whole periods, so no
+    period is left partially filled; only if a single period has more than
+    ``max_rows`` rows are rows cut within it.
+
+    Args:
+        df: Result dataframe
+        time_col: Name of the time column, or None if the result has no time
+            dimension
+        dimensions: Names of the dimension columns
+        ordered: Whether the result already follows an explicit ``order_by``
+        max_rows: Maximum number of rows to keep
+        max_points: Maximum number of distinct periods to keep
+
+    Returns:
+        tuple: (reduced dataframe, whether any rows were dropped)
+
+    Raises:
+        ValueError: If ``max_rows`` or ``max_points`` is not a positive integer
+    """
+    _check_limit("max_rows", max_rows)
+    _check_limit("max_points", max_points)
+
+    return _reduce_result(df, time_col, dimensions, ordered, max_rows, max_points)
+
+
+def execute_batch(semantic_model, requests, max_rows=DEFAULT_MAX_ROWS,
+                  max_points=DEFAULT_MAX_POINTS):
+    """Execute several query requests with as few queries as possible.
+
+    Each result has the same columns, in the same order, as running its
+    request on its own: dimensions, then the time dimension, then measures.
+
+    Args:
+        semantic_model: Semantic model to query
+        requests: List of query requests (see ``build_batches``)
+        max_rows: Maximum number of rows returned per request
+        max_points: Maximum number of distinct periods returned per request
+
+    Returns:
+        list: One dict per request, in request order, with the ``data``
+        dataframe and a ``truncated`` flag
+
+    Raises:
+        ValueError: If a request or limit is invalid
+    """
+    _check_limit("max_rows", max_rows)
+    _check_limit("max_points", max_points)
+
+    results = [None] * len(requests)
+
+    for query_params, indexes in build_batches(requests):
+        result_df = semantic_model.query(**query_params).execute()
+        time_col = None
+        if "time_grain" in query_params:
+            time_col = semantic_model.time_dimension
+
+        for index in indexes:
+            request = requests[index]
+            dimensions = list(request.get("dimensions") or [])
+            time_cols = [time_col] if time_col in result_df.columns else []
+            columns = dimensions + time_cols + request["measures"]
+
+            data, truncated = _reduce_result(
+                result_df[columns],
+                time_col=time_col,
+                dimensions=dimensions,
+                ordered=bool(query_params.get("order_by")),
+                max_rows=max_rows,
+                max_points=max_points,
+            )
+            results[index] = {"data": data, "truncated": truncated}
+
+    return results
+
+
+def to_records(df):
+    """Convert a result dataframe to JSON-serializable records.
+
+    Args:
+        df: Result dataframe
+
+    Returns:
+        list: List of row dicts with dates in ISO format
+    """
+    return json.loads(df.to_json(orient="records", date_format="iso"))
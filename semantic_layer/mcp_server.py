@@ -8,6 +8,12 @@ import sys
 def create_mcp_server():
     """Create and configure the MCP server with user lifecycle semantic model."""
     from boring_semantic_layer.mcp import MCPSemanticModel
+    from batch_query import (
+        DEFAULT_MAX_POINTS,
+        DEFAULT_MAX_ROWS,
+        execute_batch,
+        to_records,
+    )
     from semantic_model import create_user_lifecycle_semantic_model
 
     # Load semantic model
@@ -21,6 +27,35 @@ def create_mcp_server():
         name="User Lifecycle Semantic Layer"
     )
 
+    @mcp_server.tool()
+    def query_batch(
+        queries: list[dict],
+        max_rows: int = DEFAULT_MAX_ROWS,
+        max_points: int = DEFAULT_MAX_POINTS,
+    ) -> list[dict]:
+        """Run several user lifecycle queries in one call.
+
+        Each query is a dict with "measures" and optional "dimensions",
+        "time_grain", "time_range", "filters", "order_by" and "limit", as for
+        query_model; any other field is rejected. Queries that differ only in
+        their measures are merged into a single SQL query. Time series are
+        downsampled to at most max_points periods and each result is capped at
+        max_rows rows.
+
+        Returns one result per query, in order, with "records" and a
+        "truncated" flag.
+        """
+        results = execute_batch(
+            user_lifecycle_model,
+            queries,
+            max_rows=max_rows,
+            max_points=max_points,
+        )
+        return [
+            {"records": to_records(result["data"]), "truncated": result["truncated"]}
+            for result in results
+        ]
+
     return mcp_server
 
 
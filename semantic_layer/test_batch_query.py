@@ -0,0 +1,227 @@
+"""Tests for batched query execution and result reduction."""
+
+import pandas as pd
+import pytest
+
+from batch_query import (
+    _downsample_time_series,
+    _limit_rows,
+    build_batches,
+    execute_batch,
+    reduce_result,
+)
+
+
+class StubQuery:
+    """Query stub returning a fixed monthly result for the requested fields."""
+
+    def __init__(self, model, params):
+        self.model = model
+        self.params = params
+
+    def execute(self):
+        months = pd.date_range("2023-01-01", periods=self.model.months, freq="MS")
+        rows = []
+        # Reverse order, as a GROUP BY gives no ordering guarantees
+        for month in reversed(months):
+            for state in ["Retained", "New"]:
+                row = {"month": month} if "time_grain" in self.params else {}
+                if "user_state" in self.params["dimensions"]:
+                    row["user_state"] = state
+                for measure in self.params["measures"]:
+                    row[measure] = 1
+                rows.append(row)
+                if "user_state" not in self.params["dimensions"]:
+                    break
+        return pd.DataFrame(rows)
+
+
+class StubModel:
+    """Semantic model stub recording the queries it receives."""
+
+    time_dimension = "month"
+
+    def __init__(self, months=12):
+        self.months = months
+        self.queries = []
+
+    def query(self, **params):
+        self.queries.append(params)
+        return StubQuery(self, params)
+
+
+def test_build_batches_merges_requests_with_same_grouping():
+    requests = [
+        {"measures": ["active_users"], "time_grain": "TIME_GRAIN_MONTH"},
+        {"measures": ["user_id"], "dimensions": ["user_state"]},
+        {"measures": ["churn_rate", "active_users"], "time_grain": "TIME_GRAIN_MONTH"},
+    ]
+
+    batches = build_batches(requests)
+
+    assert len(batches) == 2
+    assert batches[0] == (
+        {
+            "dimensions": [],
+            "measures": ["active_users", "churn_rate"],
+            "time_grain": "TIME_GRAIN_MONTH",
+        },
+        [0, 2],
+    )
+    assert batches[1][1] == [1]
+
+
+def test_build_batches_ignores_dimension_order():
+    requests = [
+        {"measures": ["active_users"], "dimensions": ["a", "b"]},
+        {"measures": ["new_users"], "dimensions": ["b", "a"]},
+    ]
+
+    assert len(build_batches(requests)) == 1
+
+
+@pytest.mark.parametrize(
+    "request_",
+    [
+        {"measures": []},
+        {"measures": "active_users"},
+        {"measures": ["active_users", 1]},
+        {"measures": ["active_users"], "dimensions": "user_state"},
+        {"measures": ["active_users"], "dimension": ["user_state"]},
+        {"measures": ["active_users"], "limit": 0},
+        ["active_users"],
+    ],
+)
+def test_build_batches_rejects_invalid_requests(request_):
+    with pytest.raises(ValueError, match="Request 1"):
+        build_batches([{"measures": ["active_users"]}, request_])
+
+
+def test_build_batches_passes_order_by_and_limit_through():
+    requests = [
+        {"measures": ["active_users"], "order_by": [["active_users", "desc"]]},
+        {"measures": ["new_users"], "order_by": [["active_users", "desc"]]},
+        {"measures": ["churn_rate"], "limit": 3},
+    ]
+
+    batches = build_batches(requests)
+
+    assert [indexes for _, indexes in batches] == [[0, 1], [2]]
+    assert batches[0][0]["order_by"] == [["active_users", "desc"]]
+    assert batches[1][0]["limit"] == 3
+
+
+def test_build_batches_rejects_unknown_fields():
+    with pytest.raises(ValueError, match="Request 0: unknown field"):
+        build_batches([{"measures": ["active_users"], "dimension": ["user_state"]}])
+
+
+def test_execute_batch_runs_one_query_and_splits_measures():
+    model = StubModel()
+    requests = [
+        {"measures": ["active_users"], "time_grain": "TIME_GRAIN_MONTH"},
+        {"measures": ["churn_rate", "new_users"], "time_grain": "TIME_GRAIN_MONTH"},
+    ]
+
+    results = execute_batch(model, requests)
+
+    assert len(model.queries) == 1
+    assert list(results[0]["data"].columns) == ["month", "active_users"]
+    assert list(results[1]["data"].columns) == ["month", "churn_rate", "new_users"]
+    assert not results[0]["truncated"]
+    assert results[0]["data"]["month"].is_monotonic_increasing
+
+
+def test_execute_batch_caps_rows_by_whole_periods():
+    model = StubModel(months=12)
+    requests = [
+        {
+            "measures": ["active_users"],
+            "dimensions": ["user_state"],
+            "time_grain": "TIME_GRAIN_MONTH",
+        }
+    ]
+
+    result = execute_batch(model, requests, max_rows=7)[0]
+    data = result["data"]
+
+    assert result["truncated"]
+    assert len(data) == 6
+    assert (data.groupby("month").size() == 2).all()
+    assert data["month"].iloc[-1] == pd.Timestamp("2023-12-01")
+
+
+def test_execute_batch_follows_request_column_order():
+    model = StubModel()
+    requests = [
+        {"measures": ["churn_rate"], "dimensions": ["user_state"]},
+        {"measures": ["new_users", "churn_rate"], "dimensions": ["user_state"]},
+    ]
+
+    results = execute_batch(model, requests)
+
+    assert len(model.queries) == 1
+    assert list(results[1]["data"].columns) == [
+        "user_state",
+        "new_users",
+        "churn_rate",
+    ]
+
+
+def test_execute_batch_keeps_explicit_order():
+    model = StubModel(months=3)
+    requests = [
+        {
+            "measures": ["active_users"],
+            "time_grain": "TIME_GRAIN_MONTH",
+            "order_by": [["month", "desc"]],
+        }
+    ]
+
+    data = execute_batch(model, requests)[0]["data"]
+
+    assert data["month"].is_monotonic_decreasing
+
+
+@pytest.mark.parametrize("limits", [{"max_rows": 0}, {"max_points": -1}])
+def test_execute_batch_rejects_invalid_limits(limits):
+    model = StubModel()
+
+    with pytest.raises(ValueError):
+        execute_batch(model, [{"measures": ["active_users"]}], **limits)
+    assert model.queries == []
+
+
+def test_downsample_time_series_keeps_first_and_last_period():
+    df = pd.DataFrame({"month": range(10), "active_users": range(10)})
+
+    assert list(_downsample_time_series(df, "month", 3)["month"]) == [0, 4, 9]
+    assert list(_downsample_time_series(df, "month", 1)["month"]) == [9]
+    assert len(_downsample_time_series(df, "month", 10)) == 10
+
+
+def test_limit_rows():
+    df = pd.DataFrame({"active_users": range(5)})
+
+    assert _limit_rows(df, 5) is df
+    assert list(_limit_rows(df, 2)["active_users"]) == [0, 1]
+
+
+def test_reduce_result_cuts_within_period_when_period_exceeds_limit():
+    df = pd.DataFrame({"month": [1, 1, 1, 0, 0, 0], "user_state": list("cbacba")})
+
+    reduced, truncated = reduce_result(
+        df, time_col="month", dimensions=["user_state"], max_rows=2
+    )
+
+    assert truncated
+    assert list(reduced["month"]) == [1, 1]
+    assert list(reduced["user_state"]) == ["a", "b"]
+
+
+@pytest.mark.parametrize("limits", [{"max_rows": -1}, {"max_points": 0}])
+def test_reduce_result_rejects_invalid_limits(limits):
+    df = pd.DataFrame({"active_users": range(5)})
+
+    with pytest.raises(ValueError):
+        reduce_result(df, **limits)